@@ -1,13 +1,100 @@
 import requests
+import asyncio
+import orjson
+import httpx
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Blueprint, jsonify, send_from_directory, redirect, request
-from helpers import get_high_risk_asteroid_data, format_results_to_dictionary, get_palermo_leaderboard, get_vi_data
+from flask import Blueprint, jsonify, send_from_directory, redirect, request, current_app
+from helpers import get_high_risk_asteroid_data, get_sentry_designations, format_results_to_dictionary, get_palermo_leaderboard, get_vi_data, SBDB_CACHE_TIMEOUT
+from extensions import cache
 import json
 # from orbit import orbital_elements_to_3d_points  # No longer needed
 
 
 api = Blueprint('api', __name__, url_prefix='/api')
 
+# SBDB endpoint used for orbital element lookups
+SBDB_API_URL = 'https://ssd-api.jpl.nasa.gov/sbdb.api'
+
+
+async def _fetch_sbdb_async(client, des):
+    """Fetch the SBDB record for one designation inside a shared client."""
+    response = await client.get(SBDB_API_URL, params={'des': des})
+    response.raise_for_status()
+    return des, orjson.loads(response.content)
+
+
+async def _gather_sbdb(list_of_des):
+    """
+    Fire all SBDB lookups concurrently instead of one-per-loop-iteration.
+    With HTTP/2 the whole batch multiplexes over a single TLS connection
+    (httpx falls back to HTTP/1.1 pooling if JPL stops speaking h2).
+    Returns a list of (des, data_or_exception) pairs in input order.
+    """
+    limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+    async with httpx.AsyncClient(http2=True, limits=limits, timeout=5.0) as client:
+        tasks = [_fetch_sbdb_async(client, des) for des in list_of_des]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    paired = []
+    for des, result in zip(list_of_des, results):
+        if isinstance(result, Exception):
+            paired.append((des, result))
+        else:
+            paired.append(result)
+    return paired
+
+
+# Single-flight bookkeeping: at most one JPL fetch in flight per des,
+# no matter how many concurrent requests miss the cache at once.
+_inflight_lock = threading.Lock()
+_inflight = {}  # des -> threading.Event, set once the owner has finished
+
+
+def _fetch_sbdb_batch(list_of_des):
+    """
+    Resolve SBDB records for a batch of designations, serving warm
+    designations from the cache and fetching only the misses concurrently.
+    Concurrent requests for the same des are coalesced into one upstream
+    call. Returns (des, data_or_exception) pairs in input order.
+    """
+    cached = {des: cache.get('sbdb:' + des) for des in list_of_des}
+    missing = [des for des, data in cached.items() if data is None]
+
+    # Claim each miss: the first request in becomes the owner and fetches,
+    # everyone else waits on the owner's event and re-reads the cache.
+    owned, waiting = [], []
+    with _inflight_lock:
+        for des in missing:
+            event = _inflight.get(des)
+            if event is None:
+                _inflight[des] = threading.Event()
+                owned.append(des)
+            else:
+                waiting.append((des, event))
+
+    try:
+        if owned:
+            for des, data in asyncio.run(_gather_sbdb(owned)):
+                if not isinstance(data, Exception):
+                    cache.set('sbdb:' + des, data, timeout=SBDB_CACHE_TIMEOUT)
+                cached[des] = data
+    finally:
+        with _inflight_lock:
+            for des in owned:
+                _inflight.pop(des).set()
+
+    for des, event in waiting:
+        event.wait(timeout=15)
+        data = cache.get('sbdb:' + des)
+        if data is None:
+            # The owning request's fetch failed (or timed out)
+            data = RuntimeError(f'coalesced SBDB fetch for {des} failed')
+        cached[des] = data
+
+    return [(des, cached[des]) for des in list_of_des]
+
 # for those who don't know: Blueprint url prefix makes it so
 # to access this route you need to go: http://host/api/neo_data/
 # this is similar for all other api.routes due to the url_prefix parameter
@@ -18,13 +105,12 @@ def neo_data():
     if content is None:
         return jsonify({"error": "Missing or invalid JSON body"}), 400
     
-    #ip_min = content.get('ip_min')
+    # Optional impact-probability floor, applied server-side by Sentry
+    ip_min = content.get('ip_min')
     #approach_date = content.get('approach_date')
     limit = content.get('limit') or 10
-    data = get_high_risk_asteroid_data(limit)
+    data = get_high_risk_asteroid_data(limit, ip_min)
     data_dict = format_results_to_dictionary(data[0])
-    
-    print( jsonify({'data': data_dict, 'list_of_des': data[1]}))
 
     return jsonify({'data': data_dict, 'list_of_des': data[1]})
     # parse the content for key info: filters, api to request
@@ -34,19 +120,16 @@ def vi_data():
     des = request.args.get('des')
     if not des:
         return {'error': 'Must include \'des\' argument'}, 400
-    
-    result = None
-    for i in range(5):
-        try:
-            result = get_vi_data(des)
-            break
-        except Exception as e:
-            print(f'Exception Occured {e}')
-            print("Retrying...")
-    
-    if not result:
-        return {'error': 'Exceptions occurred, check stdout for more info'}, 400
-    
+
+    # Retries happen inside the pooled JPL session (urllib3.Retry with
+    # backoff on 5xx), so one call here already covers transient failures
+    try:
+        result = get_vi_data(des)
+    except requests.exceptions.Timeout:
+        return {'error': 'Sentry API request timed out'}, 504
+    except requests.exceptions.RequestException as e:
+        return {'error': f'Sentry API request failed: {e}'}, 502
+
     return jsonify(result)
 
 
@@ -59,77 +142,106 @@ def neo_data_test(limit: int):
     return jsonify({'data': data_dict, 'list_of_des': data[1]})
 
 
-# Define the six required Keplerian element short names
-KEPLERIAN_ELEMENTS = ['e', 'a', 'i', 'om', 'w', 'tp']
+# The six required Keplerian element short names (frozenset: O(1) membership checks)
+KEPLERIAN_ELEMENTS = frozenset(('e', 'a', 'i', 'om', 'w', 'tp'))
+
+
+def _extract_keplerian(data):
+    """
+    Pulls the six Keplerian orbital elements out of one SBDB response.
+    Raises (KeyError) if any required element is missing, so callers can
+    decide whether to fail the request or skip the object.
+    """
+    all_elements = data.get("orbit", {}).get("elements", [])
+    # Keep only the six required Keplerian parameters, stopping as soon as
+    # all six are collected (SBDB lists ~10-15 elements; the wanted ones
+    # cluster near the front). Indexing with el['value'] (not .get) makes
+    # a missing value fail loudly here.
+    keplerian_params = {}
+    for el in all_elements:
+        if el['name'] in KEPLERIAN_ELEMENTS:
+            keplerian_params[el['name']] = float(el['value'])
+            if len(keplerian_params) == 6:
+                break
+
+    return {
+        'a': keplerian_params['a'],      # Semi-major axis
+        'e': keplerian_params['e'],      # Eccentricity
+        'i': keplerian_params['i'],      # Inclination
+        'Omega': keplerian_params['om'], # Longitude of ascending node (RAAN)
+        'varpi': keplerian_params['w'],  # Argument of periapsis
+        'MO': keplerian_params['tp']     # Mean anomaly at epoch
+    }
+
+
+def _orbital_params_response(list_of_des):
+    """
+    Shared body of the GET and POST orbital-params routes: batch-resolve
+    the SBDB records and extract the Keplerian elements for each des.
+    """
+    # Frontends can repeat designations in the query; each unique des only
+    # needs one fetch and one extraction (order is preserved)
+    list_of_des = list(dict.fromkeys(list_of_des))
+
+    # Fan out all SBDB requests at once: total latency is ~one round trip
+    # instead of one round trip per designation (cache hits skip JPL entirely).
+    fetched = _fetch_sbdb_batch(list_of_des)
+
+    full_response = {}
+    for des, data in fetched:
+
+        if isinstance(data, Exception):
+            # Handle API connection or HTTP errors
+            return {"error": f"API request failed: {data}"}
+
+        # --- Data Extraction and Filtering ---
+
+        try:
+            # Return the orbital parameters directly instead of converting to 3D points
+            full_response[des] = _extract_keplerian(data)
+        except Exception as e:
+            return {"error": f"Error parsing API response: {e}"}, 400
+    #print(full_response)
+    return jsonify(full_response)
+
 
-@api.route('/orbital_params/', methods=['GET']) 
+@api.route('/orbital_params/', methods=['GET'])
 def get_orbital_params():
     """
     Retrieves the six Keplerian orbital elements for a given designation (des).
 
     Args:
         des (str): The object's designation (e.g., 'Eros', '2001 FO32').
-    
+
     Returns:
         dict: A dictionary containing the orbital parameters (a, e, i, omega, varpi, MO).
     """
-    
+
     # --- API Call ---
     # The 'des' query parameter is required to specify the asteroid/NEO.
-    API_URL = 'https://ssd-api.jpl.nasa.gov/sbdb.api'
     list_of_des = request.args.getlist('des')
     if not list_of_des:
         return {'error': f'No list of des given'}, 400
-    
-    full_response = {}
-    for des in list_of_des:
-        
-        params = {'des': des}
 
+    return _orbital_params_response(list_of_des)
 
-        try:
-            response = requests.get(API_URL, params=params)
-            response.raise_for_status() # Raises an exception for bad status codes (4xx or 5xx)
-            data = response.json()
-        except requests.exceptions.RequestException as e:
-            # Handle API connection or HTTP errors
-            return {"error": f"API request failed: {e}"}
 
-        # --- Data Extraction and Filtering ---
-
-        try:
-            # data["orbit"]["elements"] is a list of dictionaries, where each dict is an element.
-            
-            all_elements = data.get("orbit", {}).get("elements", [])
-            print(all_elements)
-            keplerian_params = {}
-            # Iterate through all available elements in the API response
-            for el in all_elements:
-                name = el.get("name")
-                
-                # Check if the element is one of the six required Keplerian parameters
-                if name in KEPLERIAN_ELEMENTS:
-                    # Store the full details (value, label, units)
-                    print(name)
-                    keplerian_params[name] = float(el.get("value"))
-
-            # Return the orbital parameters directly instead of converting to 3D points
-            orbital_params = {
-                'a': keplerian_params['a'],      # Semi-major axis
-                'e': keplerian_params['e'],      # Eccentricity
-                'i': keplerian_params['i'],      # Inclination
-                'Omega': keplerian_params['om'], # Longitude of ascending node (RAAN)
-                'varpi': keplerian_params['w'],  # Argument of periapsis
-                'MO': keplerian_params['tp']     # Mean anomaly at epoch
-            }
-            print(orbital_params) # for testing
-            full_response[des] = orbital_params
+@api.route('/orbital_params/batch', methods=['POST'])
+def get_orbital_params_batch():
+    """
+    Batch variant of /orbital_params/: accepts a JSON body of the form
+    {"des": ["Eros", "2001 FO32", ...]} so clients with a long list don't
+    have to build a query string. Same concurrent fan-out underneath.
+    """
+    content = request.json
+    if content is None:
+        return jsonify({"error": "Missing or invalid JSON body"}), 400
 
+    list_of_des = content.get('des')
+    if not list_of_des or not isinstance(list_of_des, list):
+        return {'error': 'Body must include a non-empty \'des\' list'}, 400
 
-        except Exception as e:
-            return {"error": f"Error parsing API response: {e}"}, 400
-    #print(full_response)
-    return jsonify(full_response)
+    return _orbital_params_response(list_of_des)
 
 @api.route('/combined_orbital_data/', methods=['POST'])
 def combined_orbital_data():
@@ -147,67 +259,65 @@ def combined_orbital_data():
         return jsonify({"error": "Missing or invalid JSON body"}), 400
     
     limit = content.get('limit') or 10
-    
-    # Use existing helper function to get the base data
+
+    # Grab just the designations first (one cheap, cached Sentry call) so
+    # the orbital fan-out can start without waiting for the full summary pass
     try:
-        data_tuple = get_high_risk_asteroid_data(limit)
-        # data_tuple[0] is the list of high-risk NEO data
-        # data_tuple[1] is the list of designations (des)
-        list_of_des = data_tuple[1]
+        list_of_des = get_sentry_designations(limit)
     except Exception as e:
         return jsonify({"error": f"Error fetching high-risk asteroid data: {e}"}), 500
 
     if not list_of_des:
-        return jsonify({'data': {}, 'list_of_des': []}), 200 # Return empty but successful
+        return jsonify({'data': {}, 'list_of_des': [], 'orbital_data': {}}), 200 # Return empty but successful
 
     # 2. Fetch Orbital Parameters for all 'des' (Logic from get_orbital_params)
-    
-    API_URL = 'https://ssd-api.jpl.nasa.gov/sbdb.api'
-    KEPLERIAN_ELEMENTS = ['e', 'a', 'i', 'om', 'w', 'tp']
+
     full_orbital_response = {}
 
-    for des in list_of_des:
-        params = {'des': des}
+    # Run the (slow) per-object summary pass in the background while the
+    # orbital batch is in flight, so the two stages overlap instead of
+    # running back to back.
+    app_obj = current_app._get_current_object()
+
+    def _summary_pass():
+        with app_obj.app_context():
+            return get_high_risk_asteroid_data(limit)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        summary_future = pool.submit(_summary_pass)
+
+        # One concurrent batch instead of a serial per-des loop
+        fetched = _fetch_sbdb_batch(list_of_des)
 
         try:
-            response = requests.get(API_URL, params=params)
-            response.raise_for_status() 
-            data = response.json()
-        except requests.exceptions.RequestException as e:
+            data_tuple = summary_future.result()
+        except Exception as e:
+            return jsonify({"error": f"Error fetching high-risk asteroid data: {e}"}), 500
+
+    # Same summary payload as /neo_data/, so clients no longer need that
+    # extra round trip before asking for orbital elements
+    data_dict = format_results_to_dictionary(data_tuple[0]) if data_tuple else {}
+
+    for des, data in fetched:
+        if isinstance(data, Exception):
             # Note: We continue if one fails, but log the error
-            print(f"Warning: API request failed for {des}: {e}")
+            print(f"Warning: API request failed for {des}: {data}")
             continue # Skip to the next designation
 
         # --- Data Extraction and Filtering ---
         try:
-            all_elements = data.get("orbit", {}).get("elements", [])
-            keplerian_params = {}
-            for el in all_elements:
-                name = el.get("name")
-                if name in KEPLERIAN_ELEMENTS:
-                    # Store the float value
-                    keplerian_params[name] = float(el.get("value"))
-
-            # Format the required parameters
-            orbital_params = {
-                'a': keplerian_params.get('a'),      # Semi-major axis
-                'e': keplerian_params.get('e'),      # Eccentricity
-                'i': keplerian_params.get('i'),      # Inclination
-                'Omega': keplerian_params.get('om'), # Longitude of ascending node (RAAN)
-                'varpi': keplerian_params.get('w'),  # Argument of periapsis
-                'MO': keplerian_params.get('tp')     # Mean anomaly at epoch
-            }
-            # Add to the master dictionary, keyed by designation
-            full_orbital_response[des] = orbital_params
-
+            # Missing elements fail loudly and skip the object instead of
+            # silently returning None
+            full_orbital_response[des] = _extract_keplerian(data)
         except Exception as e:
             print(f"Warning: Error parsing API response for {des}: {e}")
             continue # Skip to the next designation
 
     # 3. Combine and Return the final result
-    
-    # We return the list of des and the map of orbital params
+
+    # We return the NEO summary, the list of des, and the map of orbital params
     return jsonify({
+        'data': data_dict,
         'list_of_des': list_of_des,
-        'orbital_data': full_orbital_response 
+        'orbital_data': full_orbital_response
     })
@@ -0,0 +1,20 @@
+"""
+ASGI entry point for serving with uvicorn:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5001 --workers 2
+
+Unlike the Werkzeug dev server (one request per thread, blocked while
+requests.get waits on JPL), uvicorn runs the WSGI app in a thread pool
+behind an asyncio event loop, so slow upstream calls don't starve other
+clients.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+
+app = WsgiToAsgi(create_app())
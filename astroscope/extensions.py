@@ -1,2 +1,19 @@
+import orjson
+from flask.json.provider import JSONProvider
 from flask_caching import Cache
+
 cache = Cache()
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider backed by orjson, so every jsonify() call serializes
+    with the C encoder instead of the pure-Python stdlib one.
+    OPT_SERIALIZE_NUMPY lets routes return numpy arrays directly.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
@@ -8,9 +8,16 @@ Methods:
 
 '''
 
+import asyncio
+import httpx
+import numpy as np
+import orjson
 import requests
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from extensions import cache
 
 # Base URLs for the NASA JPL APIs
@@ -18,76 +25,141 @@ CAD_URL = "https://ssd-api.jpl.nasa.gov/cad.api"
 SBDB_URL = "https://ssd-api.jpl.nasa.gov/sbdb.api"
 SENTRY_URL = "https://ssd-api.jpl.nasa.gov/sentry.api"
 
-def get_high_risk_asteroid_data(limit: int = 30):
+# Shared TTL for cached SBDB records ('sbdb:<des>' keys): orbital elements
+# only change on a timescale of days. The summary pass here and the
+# orbital routes in api.py read and write the same entries, so one fetch
+# per designation serves both.
+SBDB_CACHE_TIMEOUT = 86400  # 24 hours
+
+# One pooled session for all JPL calls: reuses the TCP+TLS connection to
+# ssd-api.jpl.nasa.gov instead of doing a fresh handshake per request,
+# and retries transient gateway errors with backoff.
+_JPL = requests.Session()
+_JPL.mount('https://', HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=4, backoff_factor=0.3,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']))
+))
+
+@cache.memoize(timeout=1800)  # 30 min: the risk table changes slowly
+def _sentry_all(ip_min: str = None) -> List[dict]:
+    """
+    One shared fetch of the Sentry risk table. Every consumer (summary,
+    leaderboard, designation list, /sim/neos) filters this in memory
+    instead of re-hitting the API.
+
+    Passing `ip_min` pushes the impact-probability filter to the server
+    (Sentry's ip-min parameter), shrinking the payload instead of
+    discarding rows after download; each distinct value is cached
+    separately.
+    """
+    params = {'ip-min': ip_min} if ip_min is not None else None
+    r = _JPL.get(SENTRY_URL, params=params, timeout=10)
+    r.raise_for_status()
+    # orjson parses the multi-hundred-row risk table noticeably faster
+    # than requests' stdlib-json .json()
+    return orjson.loads(r.content).get('data', [])
+
+
+async def _fetch_sbdb_record(client, des, sem):
+    """Fetch one SBDB record under the shared concurrency semaphore."""
+    async with sem:
+        response = await client.get(SBDB_URL, params={"sstr": des}, timeout=5)
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
+
+async def _gather_sbdb_records(list_of_des):
+    """
+    Fetch SBDB records for all designations concurrently (bounded to 5
+    in-flight requests, matching what JPL tolerates). Returns a dict of
+    des -> record, with None for designations whose fetch failed.
+    """
+    sem = asyncio.Semaphore(5)
+    async with httpx.AsyncClient() as client:
+        results = await asyncio.gather(
+            *[_fetch_sbdb_record(client, des, sem) for des in list_of_des],
+            return_exceptions=True
+        )
+
+    return {
+        des: (None if isinstance(result, Exception) else result)
+        for des, result in zip(list_of_des, results)
+    }
+
+
+@cache.memoize(timeout=3600)  # 1 hour, shared by /neo_data/ and /combined_orbital_data/
+def get_high_risk_asteroid_data(limit: int = 30, ip_min: str = None):
     """
     Fetches the list of objects from the Sentry Risk Table (Impact Probability > 0)
-    and retrieves risk data (including Palermo Scale), close-approach details (CAD), 
-    and Diameter (SBDB) for them.
-    
+    and retrieves risk data (including Palermo Scale), close-approach details (CAD),
+    and Diameter (SBDB) for them. An optional `ip_min` is applied
+    server-side by the Sentry API.
+
     Returns a list of dictionaries, where the 'Name' key holds the asteroid's designation ('des').
     """
-    
+
     # --- 1. FILTER: Get the list of objects with IP > 0 from Sentry API ---
-    print("1. Filtering: Fetching high-risk objects from Sentry Risk Table (IP > 0)...")
     try:
-        sentry_response = requests.get(SENTRY_URL)
-        sentry_response.raise_for_status() 
-        sentry_data = sentry_response.json()
+        sentry_list = _sentry_all(ip_min)
     except requests.exceptions.RequestException as e:
         print(f"Error: Initial Sentry API call failed. {e}. Please try again later, as the JPL API may be temporarily down.", file=sys.stderr)
-        return []
+        return ([], [])
 
-    sentry_list = sentry_data.get('data', [])
     if not sentry_list:
+        # Reachable with a strict ip_min filter: keep the (results,
+        # list_of_des) shape so callers can index into it unconditionally
         print("Sentry API returned an empty list. No objects currently pose a high impact risk.")
-        return []
+        return ([], [])
 
     # Sentry API returns data as list of dictionaries
     if sentry_list and isinstance(sentry_list[0], dict):
-        required_sentry_fields = ['des', 'ip', 'diameter', 'ps_max'] 
+        required_sentry_fields = ['des', 'ip', 'diameter', 'ps_max']
         available_fields = list(sentry_list[0].keys())
         if not all(field in available_fields for field in required_sentry_fields):
             print(f"Sentry API response format error: Missing required fields {required_sentry_fields}. Available fields: {available_fields}", file=sys.stderr)
-            return []
+            return ([], [])
     else:
         print("Sentry API response format error: Expected list of dictionaries", file=sys.stderr)
-        return []
+        return ([], [])
 
     results = []
-    list_of_des = []
-    print(f"2. Retrieving additional data (CAD/SBDB) for the top {limit} high-risk objects...")
 
-    # --- 2. Iterate and fetch supplemental data for filtered asteroids ---
-    for item in sentry_list:
-        if len(results) >= limit:
-            break
-            
+    # --- 2. Fetch supplemental SBDB data for the top `limit` objects at once ---
+    top_items = sentry_list[:limit]
+    list_of_des = [item.get('des') for item in top_items]
+    # Serve warm designations from the shared 'sbdb:' cache (also written
+    # by the orbital routes) and batch-fetch only the misses concurrently:
+    # wall time ~max(RTT) instead of sum of RTTs
+    sbdb_records = {des: cache.get('sbdb:' + des) for des in list_of_des}
+    missing = [des for des, record in sbdb_records.items() if record is None]
+    if missing:
+        for des, record in asyncio.run(_gather_sbdb_records(missing)).items():
+            if record is not None:
+                cache.set('sbdb:' + des, record, timeout=SBDB_CACHE_TIMEOUT)
+            sbdb_records[des] = record
+
+    for item in top_items:
         # Extract risk data from the Sentry list item (dictionary format)
         name = item.get('des') # This is the 'des' value from the API
-        list_of_des.append(name)
         cumulative_prob = item.get('ip')
         diameter_km = item.get('diameter')
-        palermo_scale_val = item.get('ps_max') 
+        palermo_scale_val = item.get('ps_max')
 
         # Velocity is available directly from Sentry API
         velocity_km_s = item.get('v_inf')
         velocity = f"{float(velocity_km_s):.3f} km/s" if velocity_km_s is not None else "N/A"
-        
-        # Get MOID (Minimum Orbit Intersection Distance) from SBDB API
+
+        # Get MOID (Minimum Orbit Intersection Distance) from the SBDB record
         distance = "N/A"
-        try:
-            sbdb_params = {"sstr": name}
-            sbdb_response = requests.get(SBDB_URL, params=sbdb_params, timeout=5)
-            sbdb_response.raise_for_status()
-            sbdb_data = sbdb_response.json()
-            
+        sbdb_data = sbdb_records.get(name)
+        if sbdb_data is not None:
             orbit_data = sbdb_data.get('orbit', {})
             moid_au = orbit_data.get('moid')
             if moid_au is not None:
                 distance = f"{float(moid_au):.6f} au (MOID)"
-            
-        except requests.exceptions.RequestException:
-            pass 
 
         # --- 2B. Format diameter from Sentry data ---
         diameter = f"{float(diameter_km):.3f} km" if diameter_km is not None else "Unknown"
@@ -117,19 +189,35 @@ def get_high_risk_asteroid_data(limit: int = 30):
         
     return (results, list_of_des)
 
+@cache.memoize(timeout=3600)
+def get_sentry_designations(limit: int = 30) -> List[str]:
+    """
+    Returns just the designations of the top `limit` Sentry objects.
+
+    Cheap front half of get_high_risk_asteroid_data, so dependent fetches
+    (e.g. orbital elements) can start before the full summary pass finishes.
+    """
+    try:
+        sentry_list = _sentry_all()
+    except requests.exceptions.RequestException as e:
+        print(f"Error: Sentry API call failed. {e}", file=sys.stderr)
+        return []
+
+    return [item.get('des') for item in sentry_list[:limit]]
+
+
 def format_results_to_dictionary(asteroid_list: List[Dict[str, str]]) -> Dict[str, Dict[str, str]]:
     """
     Converts the list of asteroid dictionaries into a single dictionary 
     keyed by the asteroid's designation ('des').
     """
     
-    final_dict = {}
-    for item in asteroid_list:
-        # Use the value under the 'des' key as the dictionary key
-        name_key = item.pop("des") 
-        final_dict[name_key] = item
-        
-    return final_dict
+    # Key by 'des' without mutating the caller's dicts (the old .pop()
+    # version emptied the cached list on every call)
+    return {
+        item["des"]: {k: v for k, v in item.items() if k != "des"}
+        for item in asteroid_list
+    }
 
 @cache.memoize(timeout=36000)  # 10 hours
 def get_vi_data(des: str) -> dict:
@@ -149,9 +237,9 @@ def get_vi_data(des: str) -> dict:
     Caches per-object results for 10 hours.
     """
     try:
-        r = requests.get(SENTRY_URL, params={"des": des}, timeout=10)
+        r = _JPL.get(SENTRY_URL, params={"des": des}, timeout=10)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
 
         summary = data.get("summary", {})
         vi_list = data.get("data", [])
@@ -179,6 +267,31 @@ def get_vi_data(des: str) -> dict:
         raise e
 
 
+def _top_by_palermo(sentry_list: List[dict], limit: int) -> List[dict]:
+    """
+    Top-`limit` Sentry rows by ps_max, via a native NumPy partial sort
+    instead of a full Python-comparator sort over the whole risk table.
+    """
+    if not sentry_list:
+        return []
+
+    ps = np.fromiter(
+        (float(o.get("ps_max", -99) or -99) for o in sentry_list),
+        dtype=np.float32, count=len(sentry_list))
+    k = min(limit, len(sentry_list))
+    top_idx = np.argpartition(-ps, k - 1)[:k]
+    top_idx = top_idx[np.argsort(-ps[top_idx])]
+    return [sentry_list[i] for i in top_idx]
+
+
+def _vi_data_or_none(des):
+    """get_vi_data, but swallowing failures so one bad object can't sink a batch."""
+    try:
+        return get_vi_data(des)
+    except Exception:
+        return None
+
+
 @cache.memoize(timeout=36000)
 def get_palermo_leaderboard(limit: int = 10):
     """
@@ -186,9 +299,7 @@ def get_palermo_leaderboard(limit: int = 10):
     sorted by Palermo Scale (descending).
     """
     try:
-        r = requests.get(SENTRY_URL, timeout=10)
-        r.raise_for_status()
-        sentry_list = r.json().get("data", [])
+        sentry_list = _sentry_all()
     except requests.RequestException as e:
         print(f"Sentry API fetch failed: {e}", file=sys.stderr)
         return []
@@ -197,26 +308,30 @@ def get_palermo_leaderboard(limit: int = 10):
         print("No active impact-risk objects in Sentry data.")
         return []
 
-    # Sort by Palermo Scale descending
-    sentry_list.sort(key=lambda o: float(o.get("ps_max", -99) or -99), reverse=True)
+    # Top rows by Palermo Scale descending
+    top = _top_by_palermo(sentry_list, limit)
+    desses = [obj.get("des") for obj in top]
+    # Resolve all VI lookups at once: cached entries return instantly and
+    # cold misses overlap instead of paying one RTT per row
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        vi_by_des = dict(zip(desses, pool.map(_vi_data_or_none, desses)))
+
     leaderboard = []
-    for obj in sentry_list[:limit]:
-        des = obj.get("des")
+    for obj in top:
         full_name = obj.get("fullname") or obj.get("des", "Unknown Object")
-        vi_info = get_vi_data(des) or {}
+        vi_info = vi_by_des.get(obj.get("des"))
         if not vi_info:
-            limit+=1
             continue
-        #print(vi_info)
-
-
 
+        # get_vi_data already formatted every field with these exact
+        # templates, so pass its strings through instead of parsing them
+        # back to floats just to re-apply the same format
         leaderboard.append({
             "Full Name": full_name,
-            "Palermo Scale": f"{float(vi_info.get('Palermo Scale', -99)):.2f}",
-            "Impact Probability": f"{float(vi_info.get('Impact Probability', 0.0)):.2e}",
-            "Velocity": f"{float(vi_info.get('Velocity', 0.0).split()[0]):.3f} km/s",
-            "Diameter": f"{float(vi_info.get('Diameter', 0.0).split()[0]):.3f} km",
+            "Palermo Scale": vi_info.get("Palermo Scale", "N/A"),
+            "Impact Probability": vi_info.get("Impact Probability", "N/A"),
+            "Velocity": vi_info.get("Velocity", "N/A"),
+            "Diameter": vi_info.get("Diameter", "N/A"),
             "Kinetic Energy": vi_info.get("Kinetic Energy", "N/A"),
             "Potential Impact Date": str(vi_info.get("Potential Impact Date", "N/A")).split('.')[0]
         })
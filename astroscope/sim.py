@@ -1,22 +1,41 @@
 # sim.py
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from flask import Blueprint, render_template, jsonify, request
-from helpers import get_palermo_leaderboard, get_vi_data
+from helpers import get_palermo_leaderboard, get_vi_data, _sentry_all, _vi_data_or_none, _top_by_palermo
 import math, re, sys, json, requests
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Import your existing helpers
 # from your_project.sentry import get_palermo_leaderboard  # , get_vi_data
 
 sim = Blueprint("sim", __name__, url_prefix="/sim")
 
+# Shared pooled session for all outbound calls (JPL, WorldPop, SEDAC):
+# keeps TLS connections alive across requests and retries flaky gateways.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+))
+
 # ----------------------- Utils -----------------------
 
+# Compiled once: these run per leaderboard row / per WMS attempt
+_NUM_RE = re.compile(r"([-+]?\d*\.?\d+)")
+_SIGNED_NUM_RE = re.compile(r"(-?\d+(?:\.\d+)?)")
+
+
 def _parse_mt_str(s):
     """Accepts '123.4 Mt' or a number; returns float(Mt) or None."""
     if s is None:
         return None
     if isinstance(s, (int, float)):
         return float(s)
-    m = re.search(r"([-+]?\d*\.?\d+)", str(s))
+    m = _NUM_RE.search(str(s))
     return float(m.group(1)) if m else None
 
 # ---- Population providers ----
@@ -34,7 +53,7 @@ def population_density_worldpop(lat: float, lng: float, year: int = 2020, timeou
         "processAsMultidimensional": "true",
         "time": f"{year}-01-01T00:00:00Z",
     }
-    r = requests.get(WORLDPOP_IMG, params=params, timeout=timeout)
+    r = SESSION.get(WORLDPOP_IMG, params=params, timeout=timeout)
     r.raise_for_status()
     js = r.json()
     val = js.get("value")
@@ -44,7 +63,6 @@ def population_density_worldpop(lat: float, lng: float, year: int = 2020, timeou
 
 def population_density_sedac(lat: float, lng: float, timeout: int = 8):
     """SEDAC GPWv4 WMS GetFeatureInfo (persons/km²) with version/format fallbacks."""
-    import re as _re
     def _parse_any(payload):
         if isinstance(payload, dict):
             feats = payload.get("features") or []
@@ -60,7 +78,7 @@ def population_density_sedac(lat: float, lng: float, timeout: int = 8):
                 v = _parse_any(j)
                 if v is not None: return v
             except: pass
-            m = _re.search(r"(-?\d+(?:\.\d+)?)", payload)
+            m = _SIGNED_NUM_RE.search(payload)
             if m:
                 try: return float(m.group(1))
                 except: pass
@@ -87,113 +105,158 @@ def population_density_sedac(lat: float, lng: float, timeout: int = 8):
         attempts.append(({**base_111,"info_format":fmt},"1.1.1 "+fmt))
 
     headers = {"User-Agent":"AsteroidLauncher/1.0", "Accept":"*/*"}
-    for params, _ in attempts:
-        try:
-            resp = requests.get(SEDAC_WMS, params=params, headers=headers, timeout=timeout)
-            payload = resp.json() if "application/json" in resp.headers.get("Content-Type","") else resp.text
-            val = _parse_any(payload)
+
+    def _attempt(params):
+        resp = SESSION.get(SEDAC_WMS, params=params, headers=headers, timeout=timeout)
+        payload = resp.json() if "application/json" in resp.headers.get("Content-Type","") else resp.text
+        return _parse_any(payload)
+
+    # Race all attempts at once and take the first parseable answer -
+    # worst case is one RTT instead of six timeouts back to back
+    pool = ThreadPoolExecutor(max_workers=len(attempts))
+    futures = [pool.submit(_attempt, params) for params, _ in attempts]
+    try:
+        for future in as_completed(futures):
+            try:
+                val = future.result()
+            except Exception:
+                continue
             if val is not None:
                 if val < 0: val = 0.0
                 return (float(val), "sedac")
-        except Exception:
-            continue
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
     return (None, "sedac")
 
 def population_density_any(lat: float, lng: float, year: int = 2020):
-    """Try WorldPop first, then SEDAC fallback."""
-    try:
-        v, src = population_density_worldpop(lat, lng, year)
-        if v is not None:
-            return v, src
-    except Exception:
-        pass
+    """
+    Query WorldPop and SEDAC in parallel, preferring WorldPop's answer.
+    When WorldPop answers, return immediately without waiting on SEDAC
+    (the pool is shut down without joining, like population_density_sedac
+    does); the SEDAC future is only awaited when WorldPop fails or comes
+    back empty, so worst case is max(provider RTTs) instead of their sum.
+    """
+    pool = ThreadPoolExecutor(max_workers=2)
+    wp_future = pool.submit(population_density_worldpop, lat, lng, year)
+    sd_future = pool.submit(population_density_sedac, lat, lng)
     try:
-        v, src = population_density_sedac(lat, lng)
-        if v is not None:
-            return v, src
-    except Exception:
-        pass
-    return None, "none"
+        try:
+            v, src = wp_future.result()
+            if v is not None:
+                return v, src
+        except Exception:
+            pass
+        try:
+            v, src = sd_future.result()
+            if v is not None:
+                return v, src
+        except Exception:
+            pass
+        return None, "none"
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+@lru_cache(maxsize=4096)
+def _pop_density_cached(lat_r, lng_r, year):
+    """
+    population_density_any on a ~1 km grid: coordinates are pre-rounded to
+    0.01 deg (finer than the underlying rasters), so dragging the impact
+    marker around the same area stops re-hitting WorldPop/SEDAC.
+    """
+    return population_density_any(lat_r / 100.0, lng_r / 100.0, year)
+
 
 # ----------------------- Routes -----------------------
 
+@sim.after_request
+def _cacheable_sim_responses(response):
+    # Let browsers reuse the NEO list / population answers across
+    # navigations for a few minutes
+    if request.path in ("/sim/neos", "/sim/population") and response.status_code == 200:
+        response.headers.setdefault("Cache-Control", "public, max-age=300")
+    return response
+
+
 @sim.route("/asteroid-launcher")
 def asteroid_launcher_page():
     return render_template("asteroid_launcher.html")
 
+# /sim/neos returns at most this many rows, fetched in waves of _NEOS_WAVE
+_NEOS_TARGET = 20
+_NEOS_WAVE = 10
+
+
 @sim.route("/neos")
 def api_neos():
     """
-    Return NEOs sorted by energy_mt (desc). For speed, we **only**
-    use energy present on the leaderboard; we skip VI lookups here.
+    Return NEOs sorted by energy_mt (desc). One bulk Sentry fetch for the
+    index, then the per-des VI lookups go through the cached get_vi_data
+    helper (concurrently for the cold misses) instead of 50 fresh
+    sequential requests.
     """
     try:
-        # Use a direct approach to avoid cache issues
-        import requests
-        SENTRY_URL = "https://ssd-api.jpl.nasa.gov/sentry.api"
-        
-        r = requests.get(SENTRY_URL, timeout=10)
-        r.raise_for_status()
-        sentry_list = r.json().get("data", [])
-        
+        sentry_list = _sentry_all()
+
         if not sentry_list:
             return jsonify({"neos": []})
-        
-        # Sort by Palermo Scale descending
-        sentry_list.sort(key=lambda o: float(o.get("ps_max", -99) or -99), reverse=True)
-        
+
+        # Top 50 by Palermo Scale descending (native partial sort)
+        top = _top_by_palermo(sentry_list, 50)
+
+        # Page through in waves: objects without energy data still cost a
+        # (cold) VI lookup, so stop fetching once enough usable rows exist
+        # instead of resolving all 50 up front.
         cleaned, seen = [], set()
-        for obj in sentry_list[:50]:  # Limit to first 50 for performance
-            des = obj.get("des")
-            full_name = obj.get("fullname") or obj.get("des", "Unknown")
-            
-            if full_name in seen:
-                continue
-                
-            # Get VI data for kinetic energy
-            try:
-                vi_r = requests.get(SENTRY_URL, params={"des": des}, timeout=5)
-                vi_r.raise_for_status()
-                vi_data = vi_r.json()
-                
-                vi_list = vi_data.get("data", [])
-                top_vi = max(vi_list, key=lambda v: v.get("ps", -99) or -99) if vi_list else {}
-                e_mt = float(top_vi.get('energy', 0)) if top_vi else 0
-                
-                if e_mt > 0:  # Only include objects with energy data
+        for start in range(0, len(top), _NEOS_WAVE):
+            wave = top[start:start + _NEOS_WAVE]
+            desses = [obj.get("des") for obj in wave]
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                vi_by_des = dict(zip(desses, pool.map(_vi_data_or_none, desses)))
+
+            for obj in wave:
+                full_name = obj.get("fullname") or obj.get("des", "Unknown")
+                if full_name in seen:
+                    continue
+
+                vi_info = vi_by_des.get(obj.get("des"))
+                if not vi_info:
+                    continue
+
+                e_mt = _parse_mt_str(vi_info.get("Kinetic Energy"))
+                if e_mt and e_mt > 0:  # Only include objects with energy data
                     seen.add(full_name)
                     cleaned.append({
                         "name": full_name,
                         "energy_mt": float(f"{e_mt:.3f}"),
                         "status": "Active",
                     })
-            except Exception:
-                continue  # Skip this object if VI lookup fails
-        
-        neos_sorted = sorted(cleaned, key=lambda x: x["energy_mt"], reverse=True)
+
+            if len(cleaned) >= _NEOS_TARGET:
+                break
+
+        neos_sorted = sorted(cleaned[:_NEOS_TARGET], key=lambda x: x["energy_mt"], reverse=True)
         return jsonify({"neos": neos_sorted})
-        
+
     except Exception as e:
         print(f"NEO fetch failed: {e}", file=sys.stderr)
         return jsonify({"neos": []})
 
-@sim.route("/impact", methods=["POST"])
-def api_impact():
-    """Blast-only model (server-side physics)."""
-    js = request.get_json(force=True) or {}
-    lat = float(js.get("lat"));  lng = float(js.get("lng"))
-    energy_mt = float(js.get("energy_mt"))
-    angle_deg = float(js.get("angle_deg", 45))
-    pop_density = float(js.get("pop_density_km2", 3000))
+# Blast-radius coefficients (km per kt^(1/3)) for 10/5/1 psi overpressure
+_C10, _C5, _C1 = 0.40, 0.75, 2.10
+
 
-    W_kt = energy_mt * 1000.0
+def _blast(W_kt, angle_rad, pop_density):
+    """
+    Numeric core of the blast model: plain floats in, plain floats out.
+    Kept free of Flask objects so it stays cheap to call (and easy to
+    jit/vectorize later if the click rate ever warrants it).
+    """
     w13 = W_kt ** (1.0 / 3.0)
-    coupling = max(0.4, min(1.0, math.sin(math.radians(angle_deg))))
+    coupling = max(0.4, min(1.0, math.sin(angle_rad)))
 
-    c10, c5, c1 = 0.40, 0.75, 2.10
-    r10 = c10 * w13 * coupling
-    r5  = c5  * w13 * coupling
-    r1  = c1  * w13 * coupling
+    r10 = _C10 * w13 * coupling
+    r5  = _C5  * w13 * coupling
+    r1  = _C1  * w13 * coupling
 
     a10 = math.pi * r10 * r10
     a5  = math.pi * r5 * r5  - a10
@@ -202,6 +265,20 @@ def api_impact():
     cas_sev   = int(pop_density * a10 * 0.90)
     cas_mod   = int(pop_density * a5  * 0.40)
     cas_light = int(pop_density * a1  * 0.10)
+    return r10, r5, r1, a10, a5, a1, cas_sev, cas_mod, cas_light
+
+
+@sim.route("/impact", methods=["POST"])
+def api_impact():
+    """Blast-only model (server-side physics)."""
+    js = request.get_json(force=True) or {}
+    lat = float(js.get("lat"));  lng = float(js.get("lng"))
+    energy_mt = float(js.get("energy_mt"))
+    angle_deg = float(js.get("angle_deg", 45))
+    pop_density = float(js.get("pop_density_km2", 3000))
+
+    r10, r5, r1, a10, a5, a1, cas_sev, cas_mod, cas_light = _blast(
+        energy_mt * 1000.0, math.radians(angle_deg), pop_density)
     total = cas_sev + cas_mod + cas_light
 
     return jsonify({
@@ -226,7 +303,7 @@ def api_population():
     except (TypeError, ValueError):
         return jsonify({"ok": False, "error": "bad lat/lng/year"}), 400
 
-    val, src = population_density_any(lat, lng, year=year)
+    val, src = _pop_density_cached(round(lat * 100), round(lng * 100), year)
     if val is None:
         return jsonify({"ok": False, "density_km2": None, "src": src}), 200
     return jsonify({"ok": True, "density_km2": float(val), "src": src, "year": year})
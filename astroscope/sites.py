@@ -15,15 +15,11 @@ def home():
 
 @sites.route('/main')
 def main_page():
-    path = 'index.html'
-    print(path)
-    return send_from_directory('static', path=path)
+    return send_from_directory('static', path='index.html')
 
 @sites.route('/map')
 def impact_map():
-    path = 'impact_map.html'
-    print(path)
-    return send_from_directory('static', path=path)
+    return send_from_directory('static', path='impact_map.html')
 
 @sites.route('/')
 def base():
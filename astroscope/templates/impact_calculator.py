@@ -9,24 +9,101 @@ Based on scientific models for impact cratering and blast radius calculations.
 
 import math
 
+import numpy as np
 
-def calculate_impact_radius(density, speed, diameter):
+
+# --- Numeric kernels ---------------------------------------------------
+# Plain floats in, tuples out: no dict building or validation on the hot
+# path, so calling these per-asteroid across a NEO list costs only the
+# actual arithmetic (and they stay trivially jit-able should the volume
+# ever warrant compiling them).
+
+_LOG_1E12 = math.log(1e12)
+
+# Folded constants for the energy/radius model: E = (pi/12) * rho * d^3 * v^2,
+# R_km = k * E^(1/3) with the m -> km conversion baked into the coefficients
+_PI_OVER_12 = math.pi / 12.0
+_K_SEVERE_KM, _K_MODERATE_KM, _K_LIGHT_KM = 1.8e-7, 4.0e-7, 8.0e-7
+_J_PER_MT = 4.184e15  # joules per megaton TNT
+
+# Damage labels indexed by severity (0=Light, 1=Moderate, 2=Severe), shared
+# by the scalar and batch classification paths
+_DAMAGE_LABELS = ("Light", "Moderate", "Severe")
+
+
+def _kinetic_energy(density, speed, diameter):
+    """E = (pi/12) * rho * d^3 * v^2, with chained multiplies instead of **
+    for the small integer powers (float_mul is the fast path, BINARY_POWER
+    is not)."""
+    return _PI_OVER_12 * density * (diameter * diameter * diameter) * (speed * speed)
+
+
+def _impact_radius_kernel(density, speed, diameter, kinetic_energy=None):
+    """Returns (kinetic_energy_J, severe_km, moderate_km, light_km)."""
+    if kinetic_energy is None:
+        kinetic_energy = _kinetic_energy(density, speed, diameter)
+
+    # R = k * E^(1/3) directly in kilometers. The cube root is shared by
+    # all three radii, and exp(log(E)/3) skips generic float pow dispatch
+    # (E > 0 is guaranteed by the callers' validation).
+    cbrt_e = math.exp(math.log(kinetic_energy) * (1.0 / 3.0))
+    severe_radius_km = _K_SEVERE_KM * cbrt_e
+    moderate_radius_km = _K_MODERATE_KM * cbrt_e
+    light_radius_km = _K_LIGHT_KM * cbrt_e
+
+    return kinetic_energy, severe_radius_km, moderate_radius_km, light_radius_km
+
+
+def _crater_kernel(density, speed, diameter, kinetic_energy=None):
+    """Returns (kinetic_energy_J, crater_diameter_m, crater_depth_m)."""
+    if kinetic_energy is None:
+        kinetic_energy = _kinetic_energy(density, speed, diameter)
+
+    # Crater scaling laws (simplified model): D = 1.2 * (E/1e12)^0.294.
+    # These are empirical relationships based on impact crater studies;
+    # computed as exp(log-space) with log(1e12) folded into a constant.
+    crater_diameter_m = 1.2 * math.exp((math.log(kinetic_energy) - _LOG_1E12) * 0.294)
+    crater_depth_m = crater_diameter_m * 0.2  # Typical depth-to-diameter ratio
+
+    return kinetic_energy, crater_diameter_m, crater_depth_m
+
+
+def _casualty_kernel(severe_radius_km, moderate_radius_km, light_radius_km, population_density):
+    """Returns (severe_area, moderate_area, light_area, severe, moderate, light) casualties."""
+    severe_area_km2 = math.pi * severe_radius_km * severe_radius_km
+    moderate_area_km2 = math.pi * moderate_radius_km * moderate_radius_km
+    light_area_km2 = math.pi * light_radius_km * light_radius_km
+
+    # Severe zone: 90% fatality rate
+    # Moderate zone: 30% fatality rate
+    # Light zone: 5% fatality rate
+    severe_casualties = severe_area_km2 * population_density * 0.9
+    moderate_casualties = moderate_area_km2 * population_density * 0.3
+    light_casualties = light_area_km2 * population_density * 0.05
+
+    return (severe_area_km2, moderate_area_km2, light_area_km2,
+            severe_casualties, moderate_casualties, light_casualties)
+
+
+def calculate_impact_radius(density, speed, diameter, kinetic_energy=None):
     """
     Calculate impact radius and damage classification for an asteroid impact.
-    
+
     Args:
         density (float): Asteroid density in kg/m^3
         speed (float): Impact speed in m/s
         diameter (float): Asteroid diameter in meters
-    
+        kinetic_energy (float, optional): Precomputed kinetic energy in
+            joules, if the caller already has it (see
+            comprehensive_impact_assessment)
+
     Returns:
         dict: Dictionary containing kinetic energy, impact radii, and damage classification
     """
     
-    # Input validation
-    if not all(isinstance(x, (int, float)) for x in [density, speed, diameter]):
-        raise ValueError("All inputs must be numeric values")
-    
+    # Input validation: positivity only. The comparisons below raise
+    # TypeError on non-numeric input anyway, so the per-call isinstance
+    # sweep bought nothing on the hot path.
     if density <= 0:
         raise ValueError("Density must be positive")
     if speed <= 0:
@@ -34,37 +111,20 @@ def calculate_impact_radius(density, speed, diameter):
     if diameter <= 0:
         raise ValueError("Diameter must be positive")
     
-    # Calculate kinetic energy: E = (π / 12) * density * diameter^3 * speed^2
-    kinetic_energy = (math.pi / 12) * density * (diameter ** 3) * (speed ** 2)
-    
-    # Calculate impact radii using different damage coefficients
-    # R = k * E^(1/3)
-    severe_k = 1.8e-4
-    moderate_k = 4.0e-4
-    light_k = 8.0e-4
-    
-    # Calculate radii in meters first
-    severe_radius_m = severe_k * (kinetic_energy ** (1/3))
-    moderate_radius_m = moderate_k * (kinetic_energy ** (1/3))
-    light_radius_m = light_k * (kinetic_energy ** (1/3))
-    
-    # Convert to kilometers
-    severe_radius_km = severe_radius_m / 1000
-    moderate_radius_km = moderate_radius_m / 1000
-    light_radius_km = light_radius_m / 1000
-    
-    # Determine damage classification
-    if severe_radius_km > 5:
-        classification = "Severe"
-    elif moderate_radius_km > 2:
-        classification = "Moderate"
-    else:
-        classification = "Light"
-    
+    # All of the float math lives in the kernel; only validation and
+    # dict packaging happen at this level
+    kinetic_energy, severe_radius_km, moderate_radius_km, light_radius_km = \
+        _impact_radius_kernel(density, speed, diameter, kinetic_energy)
+
+    # Determine damage classification: compute the severity index with
+    # comparison arithmetic (branchless) and look up the label
+    idx = (severe_radius_km > 5) * 2 + (moderate_radius_km > 2) * (severe_radius_km <= 5)
+    classification = _DAMAGE_LABELS[idx]
+
     # Create result dictionary
     result = {
         "kinetic_energy_joules": kinetic_energy,
-        "kinetic_energy_megatons": kinetic_energy / (4.184e15),  # Convert to megatons TNT
+        "kinetic_energy_megatons": kinetic_energy / _J_PER_MT,  # Convert to megatons TNT
         "severe_radius_km": severe_radius_km,
         "moderate_radius_km": moderate_radius_km,
         "light_radius_km": light_radius_km,
@@ -79,34 +139,27 @@ def calculate_impact_radius(density, speed, diameter):
     return result
 
 
-def calculate_crater_dimensions(diameter, speed, density):
+def calculate_crater_dimensions(diameter, speed, density, kinetic_energy=None):
     """
     Calculate crater dimensions based on impact parameters.
-    
+
     Args:
         diameter (float): Asteroid diameter in meters
         speed (float): Impact speed in m/s
         density (float): Asteroid density in kg/m^3
-    
+        kinetic_energy (float, optional): Precomputed kinetic energy in joules
+
     Returns:
         dict: Crater dimensions and characteristics
     """
-    
-    # Input validation
-    if not all(isinstance(x, (int, float)) for x in [diameter, speed, density]):
-        raise ValueError("All inputs must be numeric values")
-    
+
+    # Input validation (positivity only; see calculate_impact_radius)
     if any(x <= 0 for x in [diameter, speed, density]):
         raise ValueError("All inputs must be positive values")
-    
-    # Calculate kinetic energy
-    kinetic_energy = (math.pi / 12) * density * (diameter ** 3) * (speed ** 2)
-    
-    # Crater scaling laws (simplified model)
-    # These are empirical relationships based on impact crater studies
-    crater_diameter_m = 1.2 * (kinetic_energy / 1e12) ** 0.294  # D_crater in meters
-    crater_depth_m = crater_diameter_m * 0.2  # Typical depth-to-diameter ratio
-    
+
+    kinetic_energy, crater_diameter_m, crater_depth_m = \
+        _crater_kernel(density, speed, diameter, kinetic_energy)
+
     return {
         "crater_diameter_m": crater_diameter_m,
         "crater_diameter_km": crater_diameter_m / 1000,
@@ -131,26 +184,14 @@ def estimate_casualties(severe_radius_km, moderate_radius_km, light_radius_km, p
         dict: Estimated casualties and affected area
     """
     
-    # Input validation
-    if not all(isinstance(x, (int, float)) for x in [severe_radius_km, moderate_radius_km, light_radius_km, population_density]):
-        raise ValueError("All inputs must be numeric values")
-    
+    # Input validation (non-negativity only; see calculate_impact_radius)
     if any(x < 0 for x in [severe_radius_km, moderate_radius_km, light_radius_km, population_density]):
         raise ValueError("All inputs must be non-negative values")
     
-    # Calculate areas
-    severe_area_km2 = math.pi * severe_radius_km * severe_radius_km
-    moderate_area_km2 = math.pi * moderate_radius_km * moderate_radius_km
-    light_area_km2 = math.pi * light_radius_km * light_radius_km
-    
-    # Estimate casualties (simplified model)
-    # Severe zone: 90% fatality rate
-    # Moderate zone: 30% fatality rate  
-    # Light zone: 5% fatality rate
-    severe_casualties = severe_area_km2 * population_density * 0.9
-    moderate_casualties = moderate_area_km2 * population_density * 0.3
-    light_casualties = light_area_km2 * population_density * 0.05
-    
+    (severe_area_km2, moderate_area_km2, light_area_km2,
+     severe_casualties, moderate_casualties, light_casualties) = _casualty_kernel(
+        severe_radius_km, moderate_radius_km, light_radius_km, population_density)
+
     total_casualties = severe_casualties + moderate_casualties + light_casualties
     
     return {
@@ -167,6 +208,76 @@ def estimate_casualties(severe_radius_km, moderate_radius_km, light_radius_km, p
     }
 
 
+def batch_impact_assessment(density_arr, speed_arr, diameter_arr):
+    """
+    Vectorized impact-radius assessment over arrays of asteroids.
+
+    Computes the same model as calculate_impact_radius, but as a handful
+    of whole-array NumPy operations instead of a per-asteroid Python loop,
+    which is the cheaper shape once a NEO list has more than a few dozen
+    rows.
+
+    Args:
+        density_arr: Densities in kg/m^3 (array-like)
+        speed_arr: Impact speeds in m/s (array-like)
+        diameter_arr: Diameters in meters (array-like)
+
+    Returns:
+        dict: Columnar arrays (kinetic_energy_joules, *_radius_km,
+        damage_classification); callers zip rows at the edge if needed.
+    """
+    density = np.asarray(density_arr, dtype=np.float64)
+    speed = np.asarray(speed_arr, dtype=np.float64)
+    diameter = np.asarray(diameter_arr, dtype=np.float64)
+
+    if np.any(density <= 0) or np.any(speed <= 0) or np.any(diameter <= 0):
+        raise ValueError("All inputs must be positive")
+
+    kinetic_energy = _PI_OVER_12 * density * diameter ** 3 * speed ** 2
+
+    # One cube root over the whole batch, then broadcast against the three
+    # damage coefficients (already in km)
+    radii_km = np.outer(np.cbrt(kinetic_energy),
+                        np.array([_K_SEVERE_KM, _K_MODERATE_KM, _K_LIGHT_KM]))
+    severe_km, moderate_km, light_km = radii_km[:, 0], radii_km[:, 1], radii_km[:, 2]
+
+    idx = np.where(severe_km > 5, 2, np.where(moderate_km > 2, 1, 0))
+    classification = np.array(_DAMAGE_LABELS)[idx]
+
+    return {
+        "kinetic_energy_joules": kinetic_energy,
+        "kinetic_energy_megatons": kinetic_energy / _J_PER_MT,
+        "severe_radius_km": severe_km,
+        "moderate_radius_km": moderate_km,
+        "light_radius_km": light_km,
+        "damage_classification": classification,
+    }
+
+
+def casualties_over_grid(severe_radius_km, moderate_radius_km, light_radius_km, population_density_arr):
+    """
+    Total-casualty estimate for one impact evaluated against many candidate
+    population densities (e.g. cells of a population raster).
+
+    The per-site total factors as (zone area x fatality rate summed over
+    zones) x density, so the whole grid is one scalar coefficient times
+    the density vector rather than a per-site call into
+    estimate_casualties.
+
+    Args:
+        severe_radius_km, moderate_radius_km, light_radius_km (float):
+            Damage radii in kilometers (one impact)
+        population_density_arr: Densities in people per km² (array-like)
+
+    Returns:
+        np.ndarray: Estimated total casualties per site
+    """
+    per_density = math.pi * (severe_radius_km * severe_radius_km * 0.9
+                             + moderate_radius_km * moderate_radius_km * 0.3
+                             + light_radius_km * light_radius_km * 0.05)
+    return per_density * np.asarray(population_density_arr, dtype=np.float64)
+
+
 def convert_nasa_data_to_parameters(nasa_data):
     """
     Convert asteroid data from NASA format to calculation parameters.
@@ -182,18 +293,19 @@ def convert_nasa_data_to_parameters(nasa_data):
     diameter_km = 0
     velocity_km_s = 0
     
-    # Handle different possible data formats
+    # Handle different possible data formats. partition() stops at the
+    # first space without allocating a token list, unlike split()
     if 'Diameter' in nasa_data:
         diameter_str = nasa_data['Diameter']
         if isinstance(diameter_str, str):
-            diameter_km = float(diameter_str.split(' ')[0])
+            diameter_km = float(diameter_str.partition(' ')[0])
         else:
             diameter_km = float(diameter_str)
-    
+
     if 'Velocity' in nasa_data:
         velocity_str = nasa_data['Velocity']
         if isinstance(velocity_str, str):
-            velocity_km_s = float(velocity_str.split(' ')[0])
+            velocity_km_s = float(velocity_str.partition(' ')[0])
         else:
             velocity_km_s = float(velocity_str)
     
@@ -229,18 +341,28 @@ def comprehensive_impact_assessment(nasa_data, population_density=100):
         # Convert NASA data to calculation parameters
         params = convert_nasa_data_to_parameters(nasa_data)
         
+        # Kinetic energy is shared by the radius and crater models, so
+        # compute it once and hand it to both
+        kinetic_energy = _kinetic_energy(
+            params["density_kg_m3"],
+            params["velocity_m_s"],
+            params["diameter_m"]
+        )
+
         # Calculate impact radius and damage
         impact_results = calculate_impact_radius(
             params["density_kg_m3"],
             params["velocity_m_s"],
-            params["diameter_m"]
+            params["diameter_m"],
+            kinetic_energy=kinetic_energy
         )
-        
+
         # Calculate crater dimensions
         crater_results = calculate_crater_dimensions(
             params["diameter_m"],
             params["velocity_m_s"],
-            params["density_kg_m3"]
+            params["density_kg_m3"],
+            kinetic_energy=kinetic_energy
         )
         
         # Estimate casualties
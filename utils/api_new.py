@@ -1,10 +1,108 @@
+import asyncio
+import httpx
+import math
+import orjson
 import requests
 import sys
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Base URLs for the NASA JPL APIs
 CAD_URL = "https://ssd-api.jpl.nasa.gov/cad.api"
 SBDB_URL = "https://ssd-api.jpl.nasa.gov/sbdb.api"
 
+# (connect, read) ceiling for every outbound call: a stalled JPL host
+# should fail the run quickly, not hang it
+TIMEOUT = (3.05, 15)
+
+# One pooled session shared by the CAD call and the threaded SBDB workers:
+# keep-alive sockets instead of a TCP+TLS handshake per request, with
+# retries for transient gateway errors (same shape as astroscope/helpers.py).
+# If requests-cache is installed (dev convenience, not a deploy
+# dependency), responses also persist to an on-disk sqlite store so
+# repeat script runs skip JPL entirely for six hours.
+try:
+    import requests_cache
+    _SESSION = requests_cache.CachedSession(
+        '.jpl_cache', backend='sqlite', expire_after=21600,
+        allowable_methods=('GET',))
+except ImportError:
+    _SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+
+
+# Folded constant for the H -> diameter estimate D = 1329 * 10^(-H/5) km,
+# computed as 1329 * exp(-H * ln(10)/5) to stay on the fast exp path
+_LN10_OVER_5 = math.log(10) / 5
+
+
+# Parsed phys_par lists keyed by designation. H magnitudes change on
+# geologic timescales, so repeat runs in one process skip SBDB entirely
+# (only the parsed list is kept, to bound memory).
+_PHYS_CACHE = {}
+
+
+async def _fetch_phys_par(client, name, sem):
+    """Fetch one object's phys_par list from SBDB (None on failure)."""
+    async with sem:
+        try:
+            response = await client.get(
+                SBDB_URL, params={"sstr": name, "phys-par": "true"}, timeout=5)
+            response.raise_for_status()
+            return orjson.loads(response.content).get('phys_par', [])
+        except (httpx.HTTPError, ValueError):
+            return None
+
+
+async def _gather_phys_par(names):
+    """
+    Fetch phys_par for all names concurrently over one HTTP/2 connection
+    (bounded to 5 in flight, matching astroscope/helpers.py). Returns a
+    dict of name -> phys_par list, or None where the fetch failed.
+    """
+    sem = asyncio.Semaphore(5)
+    async with httpx.AsyncClient(http2=True) as client:
+        results = await asyncio.gather(
+            *[_fetch_phys_par(client, name, sem) for name in names])
+    return dict(zip(names, results))
+
+
+def _diameter_from_h(absolute_magnitude):
+    """
+    Estimates a display diameter from an absolute magnitude (H) using
+    D = 1329 * 10^(-H/5) km (for asteroids). Returns None if H is missing
+    or unparsable.
+    """
+    if absolute_magnitude is None:
+        return None
+    try:
+        h = float(absolute_magnitude)
+    except (ValueError, TypeError):
+        return None
+    diameter_km = 1329 * math.exp(-h * _LN10_OVER_5)
+    return f"{diameter_km:.3f} km"
+
+
+def _diameter_from_phys_par(phys_par):
+    """
+    Derives a display diameter from the absolute magnitude (H) in a
+    phys_par list. Returns a formatted string; failures degrade to
+    "N/A"/"Unknown" like before.
+    """
+    if phys_par is None:
+        return "N/A"  # Handle API or network errors
+
+    for param in phys_par:
+        if param.get('name') == 'H':  # H is the absolute magnitude
+            diameter = _diameter_from_h(param.get('value'))
+            return diameter if diameter is not None else "Unknown (invalid H magnitude)"
+    return "Unknown (no H magnitude)"
+
+
 def get_asteroid_data(limit=10):
     """
     Fetches close-approach data for a specified number of NEOs and 
@@ -18,13 +116,16 @@ def get_asteroid_data(limit=10):
         "limit": limit,
         "neo": "true",
         "date-min": "now",
-        "sort": "date"
+        "sort": "date",
+        "diameter": "true"  # Include diameter/H so most rows skip SBDB entirely
     }
     
     try:
-        cad_response = requests.get(CAD_URL, params=cad_params)
-        cad_response.raise_for_status() 
-        cad_data = cad_response.json()
+        cad_response = _SESSION.get(CAD_URL, params=cad_params, timeout=TIMEOUT)
+        cad_response.raise_for_status()
+        # orjson parses the response bytes directly, skipping the slower
+        # stdlib json path .json() goes through
+        cad_data = orjson.loads(cad_response.content)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data from CAD API: {e}", file=sys.stderr)
         return []
@@ -44,70 +145,76 @@ def get_asteroid_data(limit=10):
         return []
 
     results = []
-    
-    print("2. Retrieving diameter for each object from SBDB API...")
-    for approach in cad_data['data'][:limit]:
+
+    approaches = cad_data['data'][:limit]
+
+    # Hoist the field positions into locals once instead of a dict lookup
+    # per field per row
+    des_idx, dist_idx, v_inf_idx = indices['des'], indices['dist'], indices['v_inf']
+
+    # CAD already carries a measured diameter (when known) and the H
+    # magnitude for every row, so most objects need no second request;
+    # only rows missing both fall back to SBDB.
+    diam_idx = indices.get('diameter')
+    h_idx = indices.get('h')
+    diameter_by_name = {}
+    for approach in approaches:
+        name = approach[des_idx]
+        diameter_km = approach[diam_idx] if diam_idx is not None else None
+        if diameter_km is not None:
+            diameter_by_name[name] = f"{float(diameter_km):.3f} km"
+            continue
+        diameter = _diameter_from_h(approach[h_idx]) if h_idx is not None else None
+        if diameter is not None:
+            diameter_by_name[name] = diameter
+
+    missing = [approach[des_idx] for approach in approaches
+               if approach[des_idx] not in diameter_by_name]
+
+    if missing:
+        print(f"2. Retrieving diameter for {len(missing)} object(s) from SBDB API...")
+        # Fan the remaining SBDB lookups out on an event loop: the batch
+        # multiplexes over one HTTP/2 connection and total wait is ~one
+        # round trip. Designations seen before come out of _PHYS_CACHE
+        # without touching the network.
+        uncached = [name for name in missing if name not in _PHYS_CACHE]
+        if uncached:
+            for name, phys in asyncio.run(_gather_phys_par(uncached)).items():
+                if phys is not None:
+                    _PHYS_CACHE[name] = phys
+        for name in missing:
+            diameter_by_name[name] = _diameter_from_phys_par(_PHYS_CACHE.get(name))
+
+    for approach in approaches:
         # Extract data available in CAD response
-        name = approach[indices['des']]
-        distance = approach[indices['dist']] # in Astronomical Units (au)
-        velocity = approach[indices['v_inf']] # in km/s
-        
-        # --- SBDB API call for Physical Parameters (including absolute magnitude) ---
-        sbdb_params = {
-            "sstr": name,
-            "phys-par": "true"  # Request physical parameters including absolute magnitude
-        }
-        
-        try:
-            sbdb_response = requests.get(SBDB_URL, params=sbdb_params)
-            sbdb_response.raise_for_status()
-            sbdb_data = sbdb_response.json()
-            
-            # Extract absolute magnitude (H) from phys_par
-            phys_par = sbdb_data.get('phys_par', [])
-            absolute_magnitude = None
-            
-            for param in phys_par:
-                if param.get('name') == 'H':  # H is the absolute magnitude
-                    absolute_magnitude = float(param.get('value'))
-                    break
-            
-            if absolute_magnitude is not None:
-                # Estimate diameter from absolute magnitude using the formula:
-                # D = 1329 * 10^(-H/5) km (for asteroids)
-                diameter_km = 1329 * (10 ** (-absolute_magnitude / 5))
-                diameter = f"{diameter_km:.3f} km"
-            else:
-                diameter = "Unknown (no H magnitude)"
-                
-        except requests.exceptions.RequestException:
-            diameter = "N/A" # Handle API or network errors
-        except (ValueError, TypeError):
-            diameter = "Unknown (invalid H magnitude)"
-            
+        name = approach[des_idx]
+        distance = approach[dist_idx] # in Astronomical Units (au)
+        velocity = approach[v_inf_idx] # in km/s
+
         # --- Combine and store the data ---
         results.append({
             "Name": name,
             "Close Approach Distance": f"{float(distance):.6f} au",
             "Velocity": f"{float(velocity):.3f} km/s",
-            "Diameter": f"diameter"
+            "Diameter": diameter_by_name.get(name, "N/A")
         })
-        
-    return results
 
-# --- Run the function and display results ---
-asteroid_list = get_asteroid_data(limit=10)
+    return results
 
-if asteroid_list:
+def _print_table(asteroid_list):
+    """Pretty-prints the result rows as an aligned text table."""
     print("\n" + "="*80)
     print(f"Top {len(asteroid_list)} Upcoming NEO Close Approaches with Required Data")
     print("="*80)
 
-    # Calculate max width for clean, formatted output
-    max_name = max([len(a['Name']) for a in asteroid_list])
-    max_dist = max([len(a['Close Approach Distance']) for a in asteroid_list])
-    max_velo = max([len(a['Velocity']) for a in asteroid_list])
-    max_diam = max([len(a['Diameter']) for a in asteroid_list])
+    # Calculate max width for clean, formatted output: one pass over
+    # the rows computing all four column widths at once
+    max_name = max_dist = max_velo = max_diam = 0
+    for a in asteroid_list:
+        max_name = max(max_name, len(a['Name']))
+        max_dist = max(max_dist, len(a['Close Approach Distance']))
+        max_velo = max(max_velo, len(a['Velocity']))
+        max_diam = max(max_diam, len(a['Diameter']))
 
     # Print header
     header = f"{'Name':<{max_name}} | {'Distance':<{max_dist}} | {'Velocity':<{max_velo}} | {'Diameter':<{max_diam}}"
@@ -122,5 +229,14 @@ if asteroid_list:
             f"{item['Velocity']:<{max_velo}} | "
             f"{item['Diameter']:<{max_diam}}"
         )
-else:
-    print("\nCould not retrieve asteroid data.")
+
+
+# --- Run the function and display results (script use only: importing
+# this module must not trigger network I/O) ---
+if __name__ == "__main__":
+    asteroid_list = get_asteroid_data(limit=10)
+
+    if asteroid_list:
+        _print_table(asteroid_list)
+    else:
+        print("\nCould not retrieve asteroid data.")